@@ -7,17 +7,31 @@ from __future__ import (
     division,
     absolute_import,
 )
+import json
 import logging
 import yaml
-from os.path import join, exists
-from os import environ
-from pipes import quote
+from os.path import join, exists, dirname
+from os import environ, scandir, stat, makedirs, remove, replace
 from collections import OrderedDict
-from appdirs import user_data_dir
-from pkg_resources import resource_string
+from functools import lru_cache
+from tempfile import NamedTemporaryFile
+from appdirs import user_data_dir, user_cache_dir
+from pkg_resources import resource_stream, resource_filename
 
 import pandas
 
+from .version import __version__
+
+try:
+    from shlex import quote
+except ImportError:
+    from pipes import quote
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 ENVIRONMENT_VARIABLES = [
     "MHCFLURRY_DATA_DIR",
     "MHCFLURRY_DOWNLOADS_CURRENT_RELEASE",
@@ -28,6 +42,8 @@ ENVIRONMENT_VARIABLES = [
 _DOWNLOADS_DIR = None
 _CURRENT_RELEASE = None
 _METADATA = None
+_DOWNLOADS_METADATA_CACHE_PATH = join(
+    user_cache_dir("mhcflurry"), "downloads_metadata.json")
 _MHCFLURRY_DEFAULT_CLASS1_MODELS_DIR = environ.get(
     "MHCFLURRY_DEFAULT_CLASS1_MODELS")
 _MHCFLURRY_DEFAULT_CLASS1_PRESENTATION_MODELS_DIR = environ.get(
@@ -56,10 +72,85 @@ def get_downloads_metadata():
     """
     global _METADATA
     if _METADATA is None:
-        _METADATA = yaml.safe_load(resource_string(__name__, "downloads.yml"))
+        # Parsing the YAML dominates this function, so the parsed result is
+        # cached as JSON in the user cache dir. The cache is used only if it
+        # was written by the same mhcflurry version from an unmodified
+        # downloads.yml.
+        cache_key = _downloads_metadata_cache_key()
+        if cache_key is not None:
+            _METADATA = _read_downloads_metadata_cache(cache_key)
+        if _METADATA is None:
+            with resource_stream(__name__, "downloads.yml") as fd:
+                _METADATA = yaml.load(fd, Loader=_YamlLoader)
+            if cache_key is not None:
+                _write_downloads_metadata_cache(cache_key, _METADATA)
     return _METADATA
 
 
+def _downloads_metadata_cache_key():
+    """
+    Return the key identifying the current downloads.yml, as a list of the
+    mhcflurry version and the file's mtime and size, or None if it cannot be
+    determined.
+    """
+    try:
+        yml_stat = stat(resource_filename(__name__, "downloads.yml"))
+    except (OSError, NotImplementedError):
+        return None
+    return [__version__, yml_stat.st_mtime, yml_stat.st_size]
+
+
+def _read_downloads_metadata_cache(cache_key):
+    """
+    Return the cached contents of downloads.yml, or None if there is no
+    usable cache for the given key.
+    """
+    try:
+        with open(_DOWNLOADS_METADATA_CACHE_PATH) as fd:
+            cached = json.load(fd)
+        if cached["key"] != cache_key:
+            return None
+        return cached["metadata"]
+    except (OSError, ValueError, KeyError, TypeError):
+        # Missing, unreadable, or malformed cache.
+        return None
+
+
+def _write_downloads_metadata_cache(cache_key, metadata):
+    """
+    Cache the parsed contents of downloads.yml. Failures are logged and
+    otherwise ignored.
+
+    Nothing is written if the metadata does not survive a round trip through
+    JSON unchanged, e.g. if it has non-string keys.
+    """
+    cache_dir = dirname(_DOWNLOADS_METADATA_CACHE_PATH)
+    temp_path = None
+    try:
+        serialized = json.dumps({"key": cache_key, "metadata": metadata})
+        if json.loads(serialized)["metadata"] != metadata:
+            logging.debug(
+                "Not caching downloads metadata: not representable as JSON")
+            return
+        makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file and rename it so that concurrent
+        # processes never read a partially written cache.
+        with NamedTemporaryFile(
+                "w", dir=cache_dir, suffix=".tmp", delete=False) as fd:
+            temp_path = fd.name
+            fd.write(serialized)
+        replace(temp_path, _DOWNLOADS_METADATA_CACHE_PATH)
+        temp_path = None
+    except (OSError, TypeError, ValueError) as e:
+        logging.debug("Could not write downloads metadata cache: %s", e)
+    finally:
+        if temp_path is not None:
+            try:
+                remove(temp_path)
+            except OSError:
+                pass
+
+
 def get_default_class1_models_dir(test_exists=True):
     """
     Return the absolute path to the default class1 models dir.
@@ -185,9 +276,15 @@ def get_current_release_downloads():
         except IOError:
             return None
 
+    # List the downloads dir once instead of testing each download's path.
+    try:
+        present = set(entry.name for entry in scandir(get_downloads_dir()))
+    except OSError:
+        present = set()
+
     return OrderedDict(
         (download["name"], {
-            'downloaded': exists(join(get_downloads_dir(), download["name"])),
+            'downloaded': download["name"] in present,
             'up_to_date': up_to_date(
                 join(get_downloads_dir(), download["name"]),
                 [download['url']] if 'url' in download else download['part_urls']),
@@ -216,8 +313,43 @@ def get_path(download_name, filename='', test_exists=True):
     string giving local absolute path
     """
     assert '/' not in download_name, "Invalid download: %s" % download_name
-    path = join(get_downloads_dir(), download_name, filename)
-    if test_exists and not exists(path):
+    path = join(_download_dir(download_name), filename)
+    if test_exists:
+        _verified_path(path, download_name)
+    return path
+
+
+@lru_cache(maxsize=128)
+def _download_dir(download_name):
+    """
+    Return the local directory for the given download. Cleared by
+    `configure`, since it depends on the configured downloads dir.
+    """
+    return join(_DOWNLOADS_DIR, download_name)
+
+
+@lru_cache(maxsize=1024)
+def _verified_path(path, download_name):
+    """
+    Raise an error telling the user how to download the data if the given
+    path does not exist.
+
+    Only successful checks are cached (lru_cache does not cache exceptions),
+    so a file that is downloaded later in the same process is still found.
+
+    Parameters
+    -----------
+    path : string
+        Absolute path to check
+
+    download_name : string
+        Name of the download containing the path, used in the error message
+
+    Returns
+    -----------
+    string giving local absolute path
+    """
+    if not exists(path):
         raise RuntimeError(
             "Missing MHCflurry downloadable file: %s. "
             "To download this data, run:\n\tmhcflurry-downloads fetch %s\n"
@@ -261,6 +393,7 @@ def configure():
             data_dir = user_data_dir("mhcflurry", version="4")
         _DOWNLOADS_DIR = join(data_dir, _CURRENT_RELEASE)
 
+    _download_dir.cache_clear()
     logging.debug("Configured MHCFLURRY_DOWNLOADS_DIR: %s", _DOWNLOADS_DIR)
 
 
@@ -27,7 +27,6 @@ import sys
 import argparse
 import logging
 import os
-from pipes import quote
 import errno
 import tarfile
 from shutil import copyfileobj
@@ -38,6 +37,11 @@ tqdm.monitor_interval = 0  # see https://github.com/tqdm/tqdm/issues/481
 import posixpath
 import pandas
 
+try:
+    from shlex import quote
+except ImportError:
+    from pipes import quote
+
 try:
     from urllib.request import urlretrieve
     from urllib.parse import urlsplit
@@ -249,7 +253,7 @@ def fetch_subcommand(args):
             temp.close()
             tar = tarfile.open(temp.name, 'r:bz2')
             names = tar.getnames()
-            logging.debug("Extracting: %s" % names)
+            logging.debug("Extracting: %s", names)
             bad_names = [
                 n for n in names
                 if n.strip().startswith("/") or n.strip().startswith("..")
@@ -4,19 +4,22 @@ compute node.
 """
 
 import traceback
+import heapq
+import logging
 import sys
 import os
 import time
-from multiprocessing import Pool, Queue, cpu_count
-from six.moves import queue
+from multiprocessing import Pool, Array, cpu_count
 from multiprocessing.util import Finalize
-from pprint import pprint
 import random
 
 import numpy
 
 from .common import configure_tensorflow
 
+# Random number generator for the current worker process. Set by worker_init.
+RNG = None
+
 
 def add_local_parallelism_args(parser):
     """
@@ -122,23 +125,25 @@ def worker_pool_with_gpu_assignments(
 
     worker_init_kwargs = [{} for _ in range(num_jobs)]
     if num_gpus:
-        print("Attempting to round-robin assign each worker a GPU.")
+        logging.debug("Attempting to round-robin assign each worker a GPU.")
         if backend != "tensorflow-default":
-            print("Forcing keras backend to be tensorflow-default")
+            logging.debug("Forcing keras backend to be tensorflow-default")
             backend = "tensorflow-default"
 
-        gpu_assignments_remaining = dict((
-            (gpu, max_workers_per_gpu) for gpu in range(num_gpus)
-        ))
+        # Min-heap of (-remaining assignments, gpu), so the GPU with the most
+        # remaining capacity is always popped first.
+        gpu_assignments_remaining = [
+            (-max_workers_per_gpu, gpu) for gpu in range(num_gpus)
+        ]
+        heapq.heapify(gpu_assignments_remaining)
         for (worker_num, kwargs) in enumerate(worker_init_kwargs):
             if gpu_assignments_remaining:
                 # Use a GPU
-                gpu_num = sorted(
-                    gpu_assignments_remaining,
-                    key=lambda key: gpu_assignments_remaining[key])[0]
-                gpu_assignments_remaining[gpu_num] -= 1
-                if not gpu_assignments_remaining[gpu_num]:
-                    del gpu_assignments_remaining[gpu_num]
+                (remaining, gpu_num) = heapq.heappop(gpu_assignments_remaining)
+                remaining += 1
+                if remaining < 0:
+                    heapq.heappush(
+                        gpu_assignments_remaining, (remaining, gpu_num))
                 gpu_assignment = [gpu_num]
             else:
                 # Use CPU
@@ -148,13 +153,18 @@ def worker_pool_with_gpu_assignments(
                 'gpu_device_nums': gpu_assignment,
                 'keras_backend': backend
             })
-            print("Worker %d assigned GPUs: %s" % (
-                worker_num, gpu_assignment))
+            logging.debug(
+                "Worker %d assigned GPUs: %s", worker_num, gpu_assignment)
 
     if worker_log_dir:
         for kwargs in worker_init_kwargs:
             kwargs["worker_log_dir"] = worker_log_dir
 
+    if not any(worker_init_kwargs):
+        # All workers are initialized identically, so there is no need for
+        # per-worker initializer arguments.
+        worker_init_kwargs = None
+
     worker_pool = make_worker_pool(
         processes=num_jobs,
         initializer=worker_init,
@@ -176,19 +186,27 @@ def make_worker_pool(
     this feature is to support allocating each worker to a (different) GPU.
 
     IMPLEMENTATION NOTE:
-        The per-worker initializer arguments are implemented using a Queue. Each
-        worker reads its arguments from this queue when it starts. When it
-        terminates, it adds its initializer arguments back to the queue, so a
-        future process can initialize itself using these arguments.
-
-        There is one issue with this approach, however. If a worker crashes, it
-        never repopulates the queue of initializer arguments. This will prevent
-        any future worker from re-using those arguments. To deal with this
-        issue we add a second 'backup queue'. This queue always contains the
-        full set of initializer arguments: whenever a worker reads from it, it
-        always pushes the pop'd args back to the end of the queue immediately.
-        If the primary arg queue is ever empty, then workers will read
-        from this backup queue.
+        The per-worker initializer arguments are implemented using a shared
+        array of slots, one per entry in initializer_kwargs_per_process. Each
+        slot counts the live workers using the corresponding arguments. When a
+        worker starts, it claims the first free slot (under the array's lock)
+        and initializes itself using those arguments. When it terminates, it
+        releases its slot, so a future process can initialize itself using
+        these arguments.
+
+        If a worker crashes, it never releases its slot. To deal with this,
+        a second shared array records the pids of all workers using each
+        slot. When no slot is free, a starting worker reclaims a slot held by
+        a worker that is no longer running, so the crashed worker's arguments
+        (e.g. its GPU) are reused by its replacement. Only if every owner is
+        alive does the worker share the least-used slot, so it always gets
+        initializer arguments. Checking whether a process is running is not
+        supported on Windows, so there workers always share in this case.
+
+        The list of initializer arguments and the slot arrays are passed as
+        initargs. With the "fork" start method these are inherited by each
+        worker directly, so starting a worker involves no IPC beyond taking
+        the slot array's lock. With "spawn" they are pickled once per worker.
 
     Parameters
     ----------
@@ -222,55 +240,190 @@ def make_worker_pool(
     if initializer:
         if initializer_kwargs_per_process:
             assert len(initializer_kwargs_per_process) == processes
-            kwargs_queue = Queue()
-            kwargs_queue_backup = Queue()
-            for kwargs in initializer_kwargs_per_process:
-                kwargs_queue.put(kwargs)
-                kwargs_queue_backup.put(kwargs)
+            slots = Array('i', processes)
+            # Pids of the workers using each slot, one row of length
+            # processes per slot. Guarded by the lock of the slots array.
+            slot_owners = Array('i', processes * processes, lock=False)
             pool_kwargs["initializer"] = worker_init_entry_point
             pool_kwargs["initargs"] = (
-                initializer, kwargs_queue, kwargs_queue_backup)
+                initializer,
+                initializer_kwargs_per_process,
+                slots,
+                slot_owners)
         else:
             pool_kwargs["initializer"] = initializer
 
     worker_pool = Pool(**pool_kwargs)
-    print("Started pool: %s" % str(worker_pool))
-    pprint(pool_kwargs)
+    logging.debug("Started pool: %s", worker_pool)
+    logging.debug("Pool arguments: %r", pool_kwargs)
     return worker_pool
 
 
 def worker_init_entry_point(
-        init_function, arg_queue=None, backup_arg_queue=None):
+        init_function,
+        kwargs_per_process=None,
+        slots=None,
+        slot_owners=None):
     kwargs = {}
-    if arg_queue:
-        try:
-            kwargs = arg_queue.get(block=False)
-        except queue.Empty:
-            print("Argument queue empty. Using round robin arg queue.")
-            kwargs = backup_arg_queue.get(block=True)
-            backup_arg_queue.put(kwargs)
-
-        # On exit we add the init args back to the queue so restarted workers
-        # (e.g. when when running with maxtasksperchild) will pickup init
-        # arguments from a previously exited worker.
-        Finalize(None, arg_queue.put, (kwargs,), exitpriority=1)
-
-    print("Initializing worker: %s" % str(kwargs))
+    finalizer = None
+    if kwargs_per_process:
+        pid = os.getpid()
+        num_slots = len(slots)
+        shared = False
+        with slots.get_lock():
+            usage = slots[:]
+            if 0 in usage:
+                slot = usage.index(0)
+                slots[slot] = 1
+                add_slot_owner(slot_owners, num_slots, slot, pid)
+            else:
+                dead = None
+                if os.name != "nt":
+                    dead = find_dead_slot_owner(slot_owners, num_slots)
+                if dead is not None:
+                    # Take over the use of the slot held by the dead owner.
+                    (slot, owner_index) = dead
+                    slot_owners[owner_index] = pid
+                else:
+                    slot = usage.index(min(usage))
+                    slots[slot] += 1
+                    add_slot_owner(slot_owners, num_slots, slot, pid)
+                    shared = True
+        if shared:
+            logging.warning(
+                "No free initializer arguments. Sharing slot %d.", slot)
+        kwargs = kwargs_per_process[slot]
+
+        # On exit we release the slot so restarted workers (e.g. when running
+        # with maxtasksperchild) will pickup init arguments from a previously
+        # exited worker.
+        finalizer = Finalize(
+            None,
+            release_worker_slot,
+            (slots, slot_owners, slot, pid),
+            exitpriority=1)
+
+    logging.debug("Initializing worker: %s", kwargs)
     init_function(**kwargs)
+    return finalizer
+
+
+def release_worker_slot(slots, slot_owners, slot, pid):
+    """
+    Mark one use of the given initializer arguments slot as released.
+
+    Parameters
+    ----------
+    slots : multiprocessing.Array
+    slot_owners : multiprocessing.Array
+    slot : int
+    pid : int
+        Process releasing the slot
+    """
+    num_slots = len(slots)
+    start = slot * num_slots
+    with slots.get_lock():
+        slots[slot] -= 1
+        for i in range(start, start + num_slots):
+            if slot_owners[i] == pid:
+                slot_owners[i] = 0
+                break
+
+
+def add_slot_owner(slot_owners, num_slots, slot, pid):
+    """
+    Record pid as using the given slot. Caller must hold the slots lock.
+
+    Parameters
+    ----------
+    slot_owners : multiprocessing.Array
+    num_slots : int
+    slot : int
+    pid : int
+    """
+    start = slot * num_slots
+    for i in range(start, start + num_slots):
+        if not slot_owners[i]:
+            slot_owners[i] = pid
+            return
+    # Row is full of owners that were never reclaimed (only possible when
+    # liveness checks are unavailable). The slot is still counted as used.
+
+
+def find_dead_slot_owner(slot_owners, num_slots):
+    """
+    Find the first slot owner that is no longer running. Caller must hold the
+    slots lock. POSIX only.
+
+    Parameters
+    ----------
+    slot_owners : multiprocessing.Array
+    num_slots : int
+
+    Returns
+    -------
+    tuple of (slot, index into slot_owners) or None
+    """
+    for (i, owner) in enumerate(slot_owners[:]):
+        if owner and not is_process_alive(owner):
+            return (i // num_slots, i)
+    return None
+
+
+def is_process_alive(pid):
+    """
+    Return whether a process with the given pid is running.
+
+    POSIX only: on Windows os.kill terminates the process.
+
+    Parameters
+    ----------
+    pid : int
+
+    Returns
+    -------
+    boolean
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists but is owned by another user.
+        return True
+    return True
 
 
 def worker_init(keras_backend=None, gpu_device_nums=None, worker_log_dir=None):
+    global RNG
+
     if worker_log_dir:
         sys.stderr = sys.stdout = open(os.path.join(
             worker_log_dir,
             "LOG-worker.%d.%d.txt" % (os.getpid(), int(time.time()))), "w")
 
-    # Each worker needs distinct random numbers
+    # Each worker needs distinct random numbers. This is needed even with the
+    # fork start method, since forked workers inherit the parent's RNG state.
+    # The global generators are reseeded for code that still uses them, and
+    # each worker also gets its own generator seeded from OS entropy.
     numpy.random.seed()
     random.seed()
+    if hasattr(numpy.random, "default_rng"):
+        RNG = numpy.random.default_rng()
+    else:
+        # numpy < 1.17
+        RNG = numpy.random.RandomState()
+
+    # Caution: if tensorflow was already configured in the parent and this
+    # worker was forked, configure_tensorflow returns immediately and
+    # gpu_device_nums is ignored. CUDA_VISIBLE_DEVICES is then never set, so
+    # the worker sees every GPU. Don't configure tensorflow in the parent
+    # before creating a pool with GPU assignments.
     if keras_backend or gpu_device_nums:
-        print("WORKER pid=%d assigned GPU devices: %s" % (
-            os.getpid(), gpu_device_nums))
+        logging.debug(
+            "WORKER pid=%d assigned GPU devices: %s",
+            os.getpid(),
+            gpu_device_nums)
         configure_tensorflow(
             keras_backend, gpu_device_nums=gpu_device_nums)
 
@@ -282,9 +435,27 @@ class WrapException(Exception):
     can still show traceback info when re-raised in the parent.
     """
     def __init__(self):
-        exc_type, exc_value, exc_tb = sys.exc_info()
-        self.exception = exc_value
-        self.formatted = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb))
+        self._exc_info = sys.exc_info()
+        self._formatted = None
+        self.exception = self._exc_info[1]
+
+    @property
+    def formatted(self):
+        # Format the traceback only when it is needed, then drop the reference
+        # to it so the frames it holds can be freed.
+        if self._formatted is None:
+            self._formatted = ''.join(
+                traceback.format_exception(*self._exc_info))
+            self._exc_info = None
+        return self._formatted
+
+    def __reduce__(self):
+        # Tracebacks can't be pickled, so send the formatted traceback when
+        # this exception is passed back from a worker process.
+        (cls, args, state) = Exception.__reduce__(self)
+        state = dict(state, _formatted=self.formatted, _exc_info=None)
+        return (cls, args, state)
+
     def __str__(self):
         return '%s\nOriginal traceback:\n%s' % (Exception.__str__(self), self.formatted)
 
@@ -327,4 +498,7 @@ def call_wrapped_kwargs(function, kwargs):
     result of calling function(**kwargs)
 
     """
-    return call_wrapped(function, **kwargs)
\ No newline at end of file
+    try:
+        return function(**kwargs)
+    except:
+        raise WrapException()
\ No newline at end of file
@@ -1,8 +1,12 @@
 """
 Utilities used in MHCflurry unit tests.
 """
+import numpy
+import pandas
+
 from . import Class1NeuralNetwork
 from .common import configure_tensorflow
+from .downloads import get_path
 
 
 def startup():
@@ -19,3 +23,39 @@ def cleanup():
     import tensorflow.keras.backend as K
     Class1NeuralNetwork.clear_model_cache()
     K.clear_session()
+
+
+def load_a0205_kim2014_training_data():
+    """
+    Load the quantitative HLA-A*02:05 9-mer measurements from kim2014 in the
+    curated training data.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    df = pandas.read_csv(
+        get_path(
+            "data_curated", "curated_training_data.affinity.csv.bz2"),
+        usecols=[
+            "allele",
+            "peptide",
+            "measurement_value",
+            "measurement_type",
+            "measurement_source",
+        ],
+        dtype={
+            "measurement_type": "category",
+            "measurement_source": "category",
+        })
+    mask = numpy.array(
+        (df.allele == "HLA-A*02:05") &
+        (df.measurement_type == "quantitative") &
+        (df.measurement_source == "kim2014"),
+        dtype=bool)
+    # Converting peptides to a fixed-width string array is sized by the
+    # longest peptide, so only do it for the few rows that pass the other
+    # filters.
+    mask[mask] = numpy.char.str_len(
+        numpy.asarray(df.peptide.values[mask], dtype=str)) == 9
+    return df.loc[mask].reset_index(drop=True)
@@ -15,7 +15,8 @@ from nose.tools import eq_, assert_raises
 from numpy import testing
 
 from mhcflurry.downloads import get_path
-from mhcflurry.testing_utils import cleanup, startup
+from mhcflurry.testing_utils import (
+    cleanup, startup, load_a0205_kim2014_training_data)
 
 DOWNLOADED_PREDICTOR = Class1AffinityPredictor.load()
 
@@ -147,34 +148,22 @@ def test_class1_affinity_predictor_a0205_memorize_training_data():
 
     allele = "HLA-A*02:05"
 
-    df = pandas.read_csv(
-        get_path(
-            "data_curated", "curated_training_data.affinity.csv.bz2"))
-    df = df.loc[
-        df.allele == allele
-    ]
-    df = df.loc[
-        df.peptide.str.len() == 9
-    ]
-    df = df.loc[
-        df.measurement_type == "quantitative"
-    ]
-    df = df.loc[
-        df.measurement_source == "kim2014"
-    ]
+    df = load_a0205_kim2014_training_data()
+    peptides = df.peptide.values
+    affinities = df.measurement_value.values
 
     predictor = Class1AffinityPredictor()
     predictor.fit_allele_specific_predictors(
         n_models=2,
         architecture_hyperparameters_list=[hyperparameters],
         allele=allele,
-        peptides=df.peptide.values,
-        affinities=df.measurement_value.values,
+        peptides=peptides,
+        affinities=affinities,
         verbose=0,
     )
     predictor.calibrate_percentile_ranks(num_peptides_per_length=1000)
-    ic50_pred = predictor.predict(df.peptide.values, allele=allele)
-    ic50_true = df.measurement_value.values
+    ic50_pred = predictor.predict(peptides, allele=allele)
+    ic50_true = affinities
     eq_(len(ic50_pred), len(ic50_true))
     testing.assert_allclose(
         numpy.log(ic50_pred),
@@ -183,13 +172,13 @@ def test_class1_affinity_predictor_a0205_memorize_training_data():
         atol=0.2)
 
     ic50_pred_df = predictor.predict_to_dataframe(
-        df.peptide.values, allele=allele)
+        peptides, allele=allele)
     print(ic50_pred_df)
     assert 'prediction_percentile' in ic50_pred_df.columns
     assert ic50_pred_df.prediction_percentile.isnull().sum() == 0
 
     ic50_pred_df2 = predictor.predict_to_dataframe(
-        df.peptide.values,
+        peptides,
         allele=allele,
         include_individual_model_predictions=True)
     print(ic50_pred_df2)
@@ -198,7 +187,7 @@ def test_class1_affinity_predictor_a0205_memorize_training_data():
     print("Starting unknown allele check")
     eq_(predictor.supported_alleles, [allele])
     ic50_pred = predictor.predict(
-        df.peptide.values,
+        peptides,
         allele="HLA-A*02:01",
         throw=False)
     assert numpy.isnan(ic50_pred).all()
@@ -206,7 +195,7 @@ def test_class1_affinity_predictor_a0205_memorize_training_data():
     assert_raises(
         ValueError,
         predictor.predict,
-        df.peptide.values,
+        peptides,
         allele="HLA-A*02:01")
 
 
@@ -13,10 +13,10 @@ from nose.tools import eq_, assert_less, assert_greater, assert_almost_equal
 import pandas
 
 from mhcflurry.class1_neural_network import Class1NeuralNetwork
-from mhcflurry.downloads import get_path
 from mhcflurry.common import random_peptides
 
-from mhcflurry.testing_utils import cleanup, startup
+from mhcflurry.testing_utils import (
+    cleanup, startup, load_a0205_kim2014_training_data)
 teardown = cleanup
 setup = startup
 
@@ -42,26 +42,14 @@ def test_class1_neural_network_a0205_training_accuracy():
     # First test a Class1NeuralNetwork, then a Class1AffinityPredictor.
     allele = "HLA-A*02:05"
 
-    df = pandas.read_csv(
-        get_path(
-            "data_curated", "curated_training_data.affinity.csv.bz2"))
-    df = df.loc[
-        df.allele == allele
-    ]
-    df = df.loc[
-        df.peptide.str.len() == 9
-    ]
-    df = df.loc[
-        df.measurement_type == "quantitative"
-    ]
-    df = df.loc[
-        df.measurement_source == "kim2014"
-    ]
+    df = load_a0205_kim2014_training_data()
+    peptides = df.peptide.values
+    affinities = df.measurement_value.values
 
     predictor = Class1NeuralNetwork(**hyperparameters)
-    predictor.fit(df.peptide.values, df.measurement_value.values)
-    ic50_pred = predictor.predict(df.peptide.values)
-    ic50_true = df.measurement_value.values
+    predictor.fit(peptides, affinities)
+    ic50_pred = predictor.predict(peptides)
+    ic50_true = affinities
     eq_(len(ic50_pred), len(ic50_true))
     testing.assert_allclose(
         numpy.log(ic50_pred),
@@ -88,7 +76,7 @@ def test_class1_neural_network_a0205_training_accuracy():
         dense_layer_l1_regularization=0.0,
         dropout_probability=0.0)
     predictor2 = Class1NeuralNetwork(**hyperparameters2)
-    predictor2.fit(df.peptide.values, df.measurement_value.values, verbose=0)
+    predictor2.fit(peptides, affinities, verbose=0)
     eq_(predictor.network().to_json(), predictor2.network().to_json())
 
 
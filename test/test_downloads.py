@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import tempfile
+
+from mhcflurry import downloads
+
+
+def test_downloads_metadata_cache():
+    original_cache_path = downloads._DOWNLOADS_METADATA_CACHE_PATH
+    original_metadata = downloads._METADATA
+    temp_dir = tempfile.mkdtemp()
+    cache_path = os.path.join(temp_dir, "mhcflurry", "downloads_metadata.json")
+    try:
+        downloads._DOWNLOADS_METADATA_CACHE_PATH = cache_path
+
+        # Cache miss: parse the YAML and write the cache.
+        downloads._METADATA = None
+        metadata = downloads.get_downloads_metadata()
+        assert "current-release" in metadata
+        with open(cache_path) as fd:
+            cached = json.load(fd)
+        assert cached["key"] == downloads._downloads_metadata_cache_key()
+        assert cached["metadata"] == metadata
+        assert os.listdir(os.path.dirname(cache_path)) == [
+            "downloads_metadata.json"]
+
+        # Cache hit: a marker written into the cache is returned.
+        cached["metadata"]["from-cache"] = True
+        with open(cache_path, "w") as fd:
+            json.dump(cached, fd)
+        downloads._METADATA = None
+        assert downloads.get_downloads_metadata()["from-cache"] is True
+
+        # Stale key: fall back to parsing the YAML and rewrite the cache.
+        cached["key"] = ["0.0.0", 0, 0]
+        with open(cache_path, "w") as fd:
+            json.dump(cached, fd)
+        downloads._METADATA = None
+        assert downloads.get_downloads_metadata() == metadata
+        with open(cache_path) as fd:
+            assert json.load(fd)["key"] == (
+                downloads._downloads_metadata_cache_key())
+
+        # Malformed cache: fall back to parsing the YAML.
+        with open(cache_path, "w") as fd:
+            fd.write("not json")
+        downloads._METADATA = None
+        assert downloads.get_downloads_metadata() == metadata
+    finally:
+        downloads._DOWNLOADS_METADATA_CACHE_PATH = original_cache_path
+        downloads._METADATA = original_metadata
+        shutil.rmtree(temp_dir)
+
+
+def test_downloads_metadata_cache_skips_non_json_metadata():
+    original_cache_path = downloads._DOWNLOADS_METADATA_CACHE_PATH
+    temp_dir = tempfile.mkdtemp()
+    cache_path = os.path.join(temp_dir, "mhcflurry", "downloads_metadata.json")
+    try:
+        downloads._DOWNLOADS_METADATA_CACHE_PATH = cache_path
+
+        # A float release key would come back from JSON as a string.
+        metadata = {
+            "current-release": 3.0,
+            "releases": {3.0: {"compatibility-version": 2}},
+        }
+        downloads._write_downloads_metadata_cache(["0.0.0", 0, 0], metadata)
+        assert not os.path.exists(cache_path)
+
+        metadata = {
+            "current-release": "3.0",
+            "releases": {"3.0": {"compatibility-version": 2}},
+        }
+        downloads._write_downloads_metadata_cache(["0.0.0", 0, 0], metadata)
+        assert downloads._read_downloads_metadata_cache(
+            ["0.0.0", 0, 0]) == metadata
+    finally:
+        downloads._DOWNLOADS_METADATA_CACHE_PATH = original_cache_path
+        shutil.rmtree(temp_dir)
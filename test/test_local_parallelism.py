@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+import pickle
+import time
+from multiprocessing import Array, Pool, Process
+
+from mhcflurry import local_parallelism
+from mhcflurry.local_parallelism import (
+    make_worker_pool,
+    worker_pool_with_gpu_assignments,
+    worker_init_entry_point,
+    call_wrapped,
+    WrapException,
+)
+
+WORKER_TAG = None
+
+
+def set_worker_tag(tag):
+    global WORKER_TAG
+    WORKER_TAG = tag
+
+
+def get_worker_tag(_):
+    time.sleep(0.01)
+    return (os.getpid(), WORKER_TAG)
+
+
+def raise_value_error(message):
+    raise ValueError(message)
+
+
+def check_worker_tags(start_method):
+    original_start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method(start_method, force=True)
+    try:
+        pool = make_worker_pool(
+            processes=3,
+            initializer=set_worker_tag,
+            initializer_kwargs_per_process=[{'tag': i} for i in range(3)],
+            max_tasks_per_worker=2)
+        try:
+            results = pool.map(get_worker_tag, range(12), chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        multiprocessing.set_start_method(original_start_method, force=True)
+
+    tags_by_pid = {}
+    for (pid, tag) in results:
+        tags_by_pid.setdefault(pid, set()).add(tag)
+
+    # Workers were restarted, each worker kept one tag, and restarted workers
+    # also got a tag.
+    assert len(tags_by_pid) > 3, tags_by_pid
+    assert all(len(tags) == 1 for tags in tags_by_pid.values()), tags_by_pid
+    assert set(tag for (_, tag) in results) == {0, 1, 2}
+
+
+def test_worker_init_args_fork():
+    check_worker_tags("fork")
+
+
+def test_worker_init_args_spawn():
+    check_worker_tags("spawn")
+
+
+def test_worker_pool_with_gpu_assignments():
+    calls = []
+
+    def fake_make_worker_pool(**kwargs):
+        calls.append(kwargs)
+
+    original_make_worker_pool = local_parallelism.make_worker_pool
+    local_parallelism.make_worker_pool = fake_make_worker_pool
+    try:
+        worker_pool_with_gpu_assignments(
+            num_jobs=5,
+            num_gpus=2,
+            max_workers_per_gpu=2)
+    finally:
+        local_parallelism.make_worker_pool = original_make_worker_pool
+
+    assert len(calls) == 1
+    assert calls[0]["processes"] == 5
+    kwargs_per_process = calls[0]["initializer_kwargs_per_process"]
+
+    # GPUs are assigned round-robin until each has max_workers_per_gpu
+    # workers. The remaining workers run on CPU.
+    assert [
+        kwargs["gpu_device_nums"] for kwargs in kwargs_per_process
+    ] == [[0], [1], [0], [1], []]
+    assert all(
+        kwargs["keras_backend"] == "tensorflow-default"
+        for kwargs in kwargs_per_process)
+
+
+def make_dead_pid():
+    dead_process = Process(target=time.sleep, args=(0,))
+    dead_process.start()
+    dead_process.join()
+    return dead_process.pid
+
+
+def test_worker_init_reclaims_slot_of_dead_worker():
+    dead_pid = make_dead_pid()
+
+    # Slot 0 is held by a live process, slot 1 by a process that crashed
+    # without releasing it. Each slot has a row of two owner entries.
+    slots = Array('i', [1, 1])
+    slot_owners = Array('i', [os.getppid(), 0, dead_pid, 0], lock=False)
+
+    received = []
+    finalizer = worker_init_entry_point(
+        lambda tag: received.append(tag),
+        [{'tag': 0}, {'tag': 1}],
+        slots,
+        slot_owners)
+
+    assert received == [1]
+    assert slots[:] == [1, 1]
+    assert slot_owners[:] == [os.getppid(), 0, os.getpid(), 0]
+
+    # Run the release now rather than at interpreter exit.
+    finalizer()
+    assert slots[:] == [1, 0]
+    assert slot_owners[:] == [os.getppid(), 0, 0, 0]
+
+
+def test_worker_init_reclaims_slot_of_dead_sharer():
+    dead_pid = make_dead_pid()
+
+    # Slot 0 was shared. Its first owner exited normally, then the worker
+    # sharing it crashed.
+    slots = Array('i', [1, 1])
+    slot_owners = Array('i', [0, dead_pid, os.getppid(), 0], lock=False)
+
+    received = []
+    finalizer = worker_init_entry_point(
+        lambda tag: received.append(tag),
+        [{'tag': 0}, {'tag': 1}],
+        slots,
+        slot_owners)
+
+    assert received == [0]
+    assert slots[:] == [1, 1]
+    assert slot_owners[:] == [0, os.getpid(), os.getppid(), 0]
+
+    finalizer()
+    assert slots[:] == [0, 1]
+    assert slot_owners[:] == [0, 0, os.getppid(), 0]
+
+
+def test_wrap_exception_pickle_round_trip():
+    try:
+        call_wrapped(raise_value_error, "local failure")
+    except WrapException as e:
+        wrapped = e
+    else:
+        assert False, "WrapException not raised"
+
+    unpickled = pickle.loads(pickle.dumps(wrapped))
+    assert isinstance(unpickled.exception, ValueError)
+    assert str(unpickled.exception) == "local failure"
+    assert "raise_value_error" in unpickled.formatted
+    assert "ValueError: local failure" in unpickled.formatted
+    assert unpickled.formatted == wrapped.formatted
+    assert unpickled._exc_info is None
+    assert "Original traceback" in str(unpickled)
+
+
+def test_wrap_exception_from_pool():
+    pool = Pool(processes=1)
+    try:
+        try:
+            pool.apply(call_wrapped, (raise_value_error, "worker failure"))
+        except WrapException as e:
+            wrapped = e
+        else:
+            assert False, "WrapException not raised"
+    finally:
+        pool.close()
+        pool.join()
+
+    assert isinstance(wrapped.exception, ValueError)
+    assert str(wrapped.exception) == "worker failure"
+    assert "raise_value_error" in wrapped.formatted
+    assert wrapped._exc_info is None